@@ -0,0 +1,407 @@
+import io
+import os
+import json
+import wave
+import queue
+import logging
+import struct
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from functools import partial
+from time import monotonic, perf_counter
+
+from pipeline_metrics import asr_batch_size, asr_queue_wait_seconds, stage_seconds, timeouts
+
+try:
+    import wenetruntime
+except ImportError:
+    wenetruntime = None
+
+logger = logging.getLogger('family_education')
+
+SAMPLE_RATE = 16000
+
+# RAM-backed scratch space for the file-based decoder fallback
+SCRATCH_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+def read_pcm16_mono(data):
+    """Return the samples of a 16 kHz mono 16-bit PCM wav, or None if ffmpeg is needed."""
+    if len(data) < 12 or data[:4] != b'RIFF' or data[8:12] != b'WAVE':
+        return None
+    offset = 12
+    fmt_ok = False
+    while offset + 8 <= len(data):
+        chunk_id, chunk_size = struct.unpack('<4sI', data[offset:offset + 8])
+        body = offset + 8
+        if chunk_id == b'fmt ':
+            if chunk_size < 16 or body + 16 > len(data):
+                return None
+            audio_format, channels, rate, _, _, bits = struct.unpack('<HHIIHH', data[body:body + 16])
+            fmt_ok = audio_format == 1 and channels == 1 and rate == SAMPLE_RATE and bits == 16
+            if not fmt_ok:
+                return None
+        elif chunk_id == b'data':
+            # streamed wavs may carry a placeholder size, so clamp to what was received
+            return data[body:body + chunk_size] if fmt_ok else None
+        offset = body + chunk_size + (chunk_size & 1)
+    return None
+
+
+def transcode_to_pcm(data, timeout=30):
+    """Decode any ffmpeg-readable upload to 16 kHz mono s16le PCM entirely through pipes."""
+    command = ['ffmpeg', '-loglevel', 'error', '-i', 'pipe:0',
+               '-f', 's16le', '-acodec', 'pcm_s16le', '-ar', str(SAMPLE_RATE), '-ac', '1', 'pipe:1']
+    with stage_seconds.labels('transcode').time():
+        result = subprocess.run(command, input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                timeout=timeout, check=True)
+    return result.stdout
+
+
+def load_pcm(data):
+    pcm = read_pcm16_mono(data)
+    return pcm if pcm is not None else transcode_to_pcm(data)
+
+
+def pcm_to_wav(pcm):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def as_pcm_bytes(audio):
+    # accepts raw s16le bytes or a numpy int16 array of samples
+    if hasattr(audio, 'tobytes'):
+        return audio.astype('<i2', copy=False).tobytes()
+    return bytes(audio)
+
+
+class WenetDecoder:
+    """wenet_voice_to_text for in-memory audio.
+
+    Uses wenetruntime directly when it is installed, with one decoder per thread.
+    Otherwise the PCM is handed to the file-based `fallback` through a RAM-backed
+    temporary wav, so the upload never touches the disk.
+    """
+
+    def __init__(self, fallback=None, model_dir=None, lang='chs'):
+        self.fallback = fallback
+        self.model_dir = model_dir
+        self.lang = lang
+        self._local = threading.local()
+
+    @property
+    def in_memory(self):
+        return wenetruntime is not None
+
+    def new_decoder(self, streaming=False):
+        kwargs = {'lang': self.lang}
+        if self.model_dir:
+            kwargs['model_dir'] = self.model_dir
+        if streaming:
+            kwargs['streaming'] = True
+        return wenetruntime.Decoder(**kwargs)
+
+    def decode(self, audio):
+        pcm = as_pcm_bytes(audio)
+        if wenetruntime is None:
+            with tempfile.NamedTemporaryFile(suffix='.wav', dir=SCRATCH_DIR) as wav_file:
+                wav_file.write(pcm_to_wav(pcm))
+                wav_file.flush()
+                return self.fallback(wav_file.name)
+        decoder = getattr(self._local, 'decoder', None)
+        if decoder is None:
+            decoder = self._local.decoder = self.new_decoder()
+        try:
+            return parse_result(decoder.decode(pcm, True))
+        finally:
+            decoder.reset()
+
+
+def parse_result(result):
+    if not result:
+        return ''
+    nbest = json.loads(result).get('nbest') or [{}]
+    return nbest[0].get('sentence', '')
+
+
+class AsrBusy(Exception):
+    pass
+
+
+class _Dispatch:
+    # one batch handed to the pool; settled exactly once, by its callback or by the reaper
+    def __init__(self, batch, deadline):
+        self.batch = batch
+        self.deadline = deadline
+        self.settled = False
+
+
+class _AsrRequest:
+    def __init__(self, pcm):
+        self.pcm = pcm
+        self.future = Future()
+        self.enqueued_at = monotonic()
+
+
+_worker_decoder = None
+
+
+def _init_worker(fallback, model_dir):
+    global _worker_decoder
+    _worker_decoder = WenetDecoder(fallback=fallback, model_dir=model_dir)
+
+
+def _decode_batch(pcms):
+    results = []
+    for pcm in pcms:
+        started = perf_counter()
+        try:
+            results.append((_worker_decoder.decode(pcm), None, perf_counter() - started))
+        except Exception as e:
+            results.append((None, repr(e), perf_counter() - started))
+    return results
+
+
+class AsrService:
+    """Decodes utterances on a pool of worker processes that each load the model once.
+
+    A dispatcher thread hands work to at most `workers` processes at a time. While
+    they are busy the queue fills up, and utterances that arrive within
+    `batch_window` seconds of each other go to a worker as one batch (one IPC round
+    trip). Callers get TimeoutError after `timeout` and AsrBusy once `max_queue`
+    utterances are waiting. The pool replaces a worker that dies (a crash in the
+    decoder, an OOM kill) but never calls back for its batch, so batches still
+    outstanding `timeout` seconds after dispatch are failed and their slot freed.
+
+    Workers are forked when the service is created, so build it before the
+    application starts its own threads.
+    """
+
+    def __init__(self, fallback=None, model_dir=None, workers=2, max_batch=8, batch_window=0.005,
+                 max_queue=64, timeout=30):
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.timeout = timeout
+        self._pool = multiprocessing.get_context('fork').Pool(
+            workers, initializer=_init_worker, initargs=(fallback, model_dir))
+        self._slots = threading.Semaphore(workers)
+        self._inflight_lock = threading.Lock()
+        self._inflight = set()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._dispatcher = threading.Thread(target=self._dispatch, name='asr-dispatcher', daemon=True)
+        self._dispatcher.start()
+
+    def transcribe(self, audio, timeout=None):
+        request = _AsrRequest(as_pcm_bytes(audio))
+        try:
+            self._queue.put_nowait(request)
+        except queue.Full:
+            raise AsrBusy()
+        try:
+            return request.future.result(timeout or self.timeout)
+        except FutureTimeoutError:
+            request.future.cancel()
+            timeouts.labels('asr').inc()
+            raise TimeoutError('Timeout waiting for speech recognition')
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # requests whose caller already gave up are dropped here
+        return [request for request in batch if request.future.set_running_or_notify_cancel()]
+
+    def _dispatch(self):
+        while True:
+            while not self._slots.acquire(timeout=1):
+                self._reap()
+            self._reap()
+            batch = self._collect_batch()
+            if not batch:
+                self._slots.release()
+                continue
+            now = monotonic()
+            for request in batch:
+                asr_queue_wait_seconds.observe(now - request.enqueued_at)
+            asr_batch_size.observe(len(batch))
+            dispatch = _Dispatch(batch, now + self.timeout)
+            with self._inflight_lock:
+                self._inflight.add(dispatch)
+            self._pool.apply_async(_decode_batch, ([request.pcm for request in batch],),
+                                   callback=partial(self._finish, dispatch),
+                                   error_callback=partial(self._fail, dispatch))
+
+    def _settle(self, dispatch):
+        with self._inflight_lock:
+            if dispatch.settled:
+                return False
+            dispatch.settled = True
+            self._inflight.discard(dispatch)
+        self._slots.release()
+        return True
+
+    def _reap(self):
+        now = monotonic()
+        with self._inflight_lock:
+            expired = [dispatch for dispatch in self._inflight if dispatch.deadline < now]
+        for dispatch in expired:
+            if self._settle(dispatch):
+                logger.warning(f'ASR worker did not return a batch of {len(dispatch.batch)}, releasing its slot')
+                self._fail_requests(dispatch.batch, TimeoutError('ASR worker did not return'))
+
+    def _finish(self, dispatch, results):
+        if not self._settle(dispatch):
+            return
+        for request, (text, error, seconds) in zip(dispatch.batch, results):
+            # decoding runs in the worker process, so its timing is reported back and observed here
+            stage_seconds.labels('wenet').observe(seconds)
+            if error is None:
+                request.future.set_result(text)
+            else:
+                request.future.set_exception(RuntimeError(error))
+
+    def _fail(self, dispatch, error):
+        if self._settle(dispatch):
+            self._fail_requests(dispatch.batch, error)
+
+    @staticmethod
+    def _fail_requests(batch, error):
+        for request in batch:
+            request.future.set_exception(error)
+
+
+class StreamingSession:
+    """One utterance streamed by a client while it is being spoken.
+
+    feed() takes audio as it arrives, raw s16le PCM or, given `container`, chunks of
+    a webm/ogg recording that are piped through a long-lived ffmpeg. With a wenet
+    streaming `decoder` the PCM is decoded as it comes in and poll() returns the
+    partial transcript whenever it changes. Without one, the PCM is buffered and
+    `finalize` decodes it when finish() is called.
+    """
+
+    def __init__(self, decoder=None, container=None, finalize=None, timeout=30):
+        self.decoder = decoder
+        self.finalize = finalize
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pcm = bytearray()
+        self._remainder = b''
+        self._partial = ''
+        self._changed = False
+        self._ffmpeg = None
+        self._reader = None
+        if container:
+            command = ['ffmpeg', '-loglevel', 'error', '-f', container, '-i', 'pipe:0',
+                       '-f', 's16le', '-acodec', 'pcm_s16le', '-ar', str(SAMPLE_RATE), '-ac', '1', 'pipe:1']
+            self._ffmpeg = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                            stderr=subprocess.DEVNULL)
+            self._reader = threading.Thread(target=self._read_pcm, name='asr-stream-reader', daemon=True)
+            self._reader.start()
+
+    def feed(self, data):
+        if self._ffmpeg is None:
+            self._accept(data)
+            return
+        self._ffmpeg.stdin.write(data)
+        self._ffmpeg.stdin.flush()
+
+    def _read_pcm(self):
+        while True:
+            chunk = self._ffmpeg.stdout.read1(8192)
+            if not chunk:
+                return
+            self._accept(chunk)
+
+    def _accept(self, data):
+        with self._lock:
+            # keep whole samples only; a trailing odd byte waits for the next chunk
+            data = self._remainder + data
+            usable = len(data) - len(data) % 2
+            self._remainder = data[usable:]
+            if self.decoder is None:
+                self._pcm += data[:usable]
+                return
+            text = parse_result(self.decoder.decode(data[:usable], False))
+            if text and text != self._partial:
+                self._partial = text
+                self._changed = True
+
+    def poll(self):
+        """The partial transcript if it changed since the last poll, otherwise None."""
+        with self._lock:
+            if not self._changed:
+                return None
+            self._changed = False
+            return self._partial
+
+    def finish(self):
+        if self._ffmpeg is not None:
+            self._ffmpeg.stdin.close()
+            self._ffmpeg.wait(self.timeout)
+            self._reader.join(self.timeout)
+        with self._lock:
+            if self.decoder is None:
+                return self.finalize(bytes(self._pcm))
+            return parse_result(self.decoder.decode(b'', True))
+
+    def close(self):
+        if self._ffmpeg is not None and self._ffmpeg.poll() is None:
+            self._ffmpeg.kill()
+            self._ffmpeg.wait()
+
+
+class StreamingDecoderPool:
+    """Caps concurrent streams and reuses their wenet streaming decoders.
+
+    Building a decoder loads the model, so decoders are reset and kept for the next
+    stream rather than created per connection. When wenetruntime is missing the
+    pool still enforces the cap and hands out None.
+    """
+
+    def __init__(self, decoder, max_streams=8):
+        self.decoder = decoder
+        self._slots = threading.BoundedSemaphore(max_streams)
+        self._lock = threading.Lock()
+        self._idle = []
+
+    def acquire(self, timeout=None):
+        if not self._slots.acquire(timeout=timeout):
+            raise AsrBusy()
+        if not self.decoder.in_memory:
+            return None
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        try:
+            return self.decoder.new_decoder(streaming=True)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, decoder):
+        if decoder is not None:
+            decoder.reset()
+            with self._lock:
+                self._idle.append(decoder)
+        self._slots.release()
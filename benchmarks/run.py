@@ -0,0 +1,202 @@
+"""Benchmark parent_app against SQLite and local stand-ins for every external service.
+
+Run from the repository root:
+
+    python -m benchmarks.run --workload burst,polling,voice,sms --duration 30 --concurrency 8
+
+The LLM, profile summarizers, knowledge accumulation, TTS, ASR and the SMS
+gateway are replaced by deterministic stubs (benchmarks/stubs.py and
+benchmarks/sms_gateway.py) whose latency is set on the command line. The
+database is migrated with the real migrations and seeded with a
+production-shaped data set, then each workload runs against a threaded local
+server. The report lists p50/p95/p99 latency and the SQL statements and DB
+time per request for every endpoint. --json writes the same numbers for
+before/after comparisons.
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+import tempfile
+import importlib
+import threading
+
+from werkzeug.serving import make_server
+
+from benchmarks import stubs
+from benchmarks.seed import seed
+from benchmarks.sms_gateway import SmsGateway
+from benchmarks.workloads import WORKLOADS, percentile, run_workload
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--db', help='database URI (default: a fresh SQLite file in --workdir)')
+    parser.add_argument('--workdir', help='directory for the database, audio cache and log (default: a temp dir)')
+    parser.add_argument('--no-seed', action='store_true', help='reuse the data already in --db')
+    parser.add_argument('--parents', type=int, default=200)
+    parser.add_argument('--experts', type=int, default=10)
+    parser.add_argument('--chats-per-parent', type=int, default=3)
+    parser.add_argument('--messages', type=int, default=30000)
+    parser.add_argument('--workload', default='burst,polling,voice,sms',
+                        help='comma separated, from: ' + ', '.join(WORKLOADS))
+    parser.add_argument('--duration', type=float, default=30, help='seconds per workload')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads per workload')
+    parser.add_argument('--agent-latency', type=float, default=stubs.LATENCY['agent'])
+    parser.add_argument('--summary-latency', type=float, default=stubs.LATENCY['summary'])
+    parser.add_argument('--accumulation-latency', type=float, default=stubs.LATENCY['accumulation'])
+    parser.add_argument('--tts-latency', type=float, default=stubs.LATENCY['tts'])
+    parser.add_argument('--asr-latency', type=float, default=stubs.LATENCY['asr'])
+    parser.add_argument('--sms-latency', type=float, default=0.3)
+    parser.add_argument('--low-score-rate', type=float, default=stubs.LOW_SCORE_RATE,
+                        help='share of bot replies that suspend their chat')
+    parser.add_argument('--json', help='also write the results to this file')
+    return parser.parse_args(argv)
+
+
+def boot(args, workdir, gateway_url):
+    stubs.LATENCY.update({
+        'agent': args.agent_latency,
+        'summary': args.summary_latency,
+        'accumulation': args.accumulation_latency,
+        'tts': args.tts_latency,
+        'asr': args.asr_latency,
+    })
+    stubs.LOW_SCORE_RATE = args.low_score_rate
+    stubs.install()
+    os.environ.update({
+        'SQLALCHEMY_DATABASE_URI': args.db or f'sqlite:///{os.path.join(workdir, "benchmark.db")}',
+        'SMS_GATEWAY_URL': gateway_url,
+        'AUDIO_TMP_DIR': os.path.join(workdir, 'audio'),
+        'LOG_FILE': os.path.join(workdir, 'family_education.log'),
+        # every client shares 127.0.0.1, so only the per-phone limit stays meaningful
+        'SMS_IP_BURST': '1000000000',
+    })
+    sys.path.insert(0, ROOT)
+    app_module = importlib.import_module('parent_app')
+
+    from flask_migrate import upgrade
+    with app_module.app.app_context():
+        upgrade(directory=os.path.join(ROOT, 'migrations'))
+    logger = logging.getLogger('family_education')
+    # alembic's fileConfig disables loggers that already exist and adds a root console handler
+    logger.disabled = False
+    for handler in logger.handlers + logging.getLogger().handlers:
+        if not isinstance(handler, logging.FileHandler):
+            handler.setLevel(logging.WARNING)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    return app_module
+
+
+def existing_data(app_module):
+    with app_module.app.app_context():
+        Chat = app_module.Chat
+        return {
+            'parent_ids': [row[0] for row in app_module.db.session.query(app_module.Parent.id)],
+            'expert_ids': [row[0] for row in app_module.db.session.query(app_module.Expert.id)],
+            'active_chats': [tuple(row) for row in app_module.db.session.query(Chat.id, Chat.parent_id)
+                             .filter(Chat.status != 0).order_by(Chat.id)],
+            'topics': importlib.import_module('benchmarks.seed').TOPICS,
+        }
+
+
+def db_stats():
+    # cumulative (statements, seconds, requests) per endpoint from the query accounting histograms
+    query_accounting = importlib.import_module('query_accounting')
+    stats = {}
+    for histogram, index in ((query_accounting.db_queries_per_request, 0),
+                             (query_accounting.db_seconds_per_request, 1)):
+        for metric in histogram.collect():
+            for sample in metric.samples:
+                endpoint = sample.labels.get('endpoint')
+                entry = stats.setdefault(endpoint, [0.0, 0.0, 0.0])
+                if sample.name.endswith('_sum'):
+                    entry[index] = sample.value
+                elif sample.name.endswith('_count') and index == 0:
+                    entry[2] = sample.value
+    return stats
+
+
+def summarize(recorder, before, after):
+    results = {}
+    for endpoint in sorted(set(recorder.samples) | set(recorder.errors)):
+        samples = sorted(recorder.samples.get(endpoint, []))
+        result = {
+            'requests': len(samples),
+            'errors': recorder.errors.get(endpoint, 0),
+            'p50_ms': None, 'p95_ms': None, 'p99_ms': None,
+            'queries_per_request': None, 'db_ms_per_request': None,
+        }
+        for p in (50, 95, 99):
+            value = percentile(samples, p)
+            result[f'p{p}_ms'] = round(value * 1000, 1) if value is not None else None
+        start = before.get(endpoint, [0.0, 0.0, 0.0])
+        end = after.get(endpoint, [0.0, 0.0, 0.0])
+        requests = end[2] - start[2]
+        if requests:
+            result['queries_per_request'] = round((end[0] - start[0]) / requests, 2)
+            result['db_ms_per_request'] = round((end[1] - start[1]) / requests * 1000, 2)
+        results[endpoint] = result
+    return results
+
+
+def print_report(name, results):
+    print(f'\n== {name}')
+    header = f'{"endpoint":<26}{"n":>7}{"err":>6}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"queries":>9}{"db ms":>9}'
+    print(header)
+    print('-' * len(header))
+    for endpoint, result in results.items():
+        cells = [result[key] for key in ('p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request', 'db_ms_per_request')]
+        cells = ['-' if value is None else value for value in cells]
+        print(f'{endpoint:<26}{result["requests"]:>7}{result["errors"]:>6}'
+              f'{cells[0]:>10}{cells[1]:>10}{cells[2]:>10}{cells[3]:>9}{cells[4]:>9}')
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workloads = [name.strip() for name in args.workload.split(',') if name.strip()]
+    unknown = [name for name in workloads if name not in WORKLOADS]
+    if unknown:
+        raise SystemExit(f'Unknown workload: {", ".join(unknown)}')
+    workdir = args.workdir or tempfile.mkdtemp(prefix='family-education-benchmark-')
+    os.makedirs(workdir, exist_ok=True)
+
+    # bind the gateway before parent_app is imported, but start its thread afterwards:
+    # importing parent_app forks the ASR workers
+    gateway = SmsGateway(latency=args.sms_latency)
+    app_module = boot(args, workdir, gateway.url)
+    gateway.start()
+
+    if args.no_seed:
+        data = existing_data(app_module)
+    else:
+        data = seed(app_module, parents=args.parents, experts=args.experts,
+                    chats_per_parent=args.chats_per_parent, messages=args.messages)
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='benchmark-server', daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+    print(f'Serving {os.environ["SQLALCHEMY_DATABASE_URI"]} on {base_url}; '
+          f'{len(data["parent_ids"])} parents, {len(data["active_chats"])} active chats')
+
+    report = {'config': vars(args), 'workloads': {}}
+    for name in workloads:
+        before = db_stats()
+        recorder = run_workload(WORKLOADS[name], base_url, data, args.concurrency, args.duration)
+        results = summarize(recorder, before, db_stats())
+        report['workloads'][name] = results
+        print_report(name, results)
+    if 'sms' in workloads:
+        print(f'\nSMS gateway received {gateway.received} sends')
+
+    server.shutdown()
+    gateway.stop()
+    if args.json:
+        with open(args.json, 'w') as report_file:
+            json.dump(report, report_file, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
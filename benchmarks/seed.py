@@ -0,0 +1,94 @@
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, update
+
+TOPICS = ['学习', '作业', '玩手机', '睡眠', '情绪', '沟通', '早恋', '考试', '兴趣班', '叛逆', '朋友', '零花钱']
+PHRASES = ['最近孩子{}方面让我很头疼', '老师反映孩子{}有问题', '怎么和孩子聊{}比较好', '孩子因为{}和我吵架了',
+           '建议您从{}入手，多倾听孩子', '关于{}，可以先和孩子约定规则']
+
+
+def _rows_in_chunks(rows, size=1000):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def seed(app_module, parents=200, experts=10, chats_per_parent=3, messages=30000, logic_keys=50, seed=1):
+    """Fill an empty database with a deterministic, production-shaped data set.
+
+    Returns a dict describing what was created, for the workloads to pick from.
+    """
+    app, db = app_module.app, app_module.db
+    Parent, Expert, Chat, Message = app_module.Parent, app_module.Expert, app_module.Chat, app_module.Message
+    LogicKey, Logic = app_module.LogicKey, app_module.Logic
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+
+    with app.app_context():
+        db.session.execute(insert(Expert), [{
+            'username': f'expert{i}', 'phone': f'139{i:08d}', 'password_hash': 'benchmark',
+        } for i in range(experts)])
+        db.session.execute(insert(Parent), [{
+            'username': f'parent{i}', 'phone': f'138{i:08d}', 'password_hash': 'benchmark',
+            'profile': '', 'respond_strategy': '', 'event_summary': '',
+        } for i in range(parents)])
+        expert_ids = [row[0] for row in db.session.query(Expert.id).order_by(Expert.id)]
+        parent_ids = [row[0] for row in db.session.query(Parent.id).order_by(Parent.id)]
+
+        chat_rows = []
+        for parent_id in parent_ids:
+            expert_id = expert_ids[parent_id % len(expert_ids)]
+            for _ in range(chats_per_parent):
+                created = now - timedelta(days=rng.uniform(1, 60))
+                chat_rows.append({
+                    'title': '', 'parent_id': parent_id, 'expert_id': expert_id, 'created_at': created,
+                    'last_message_timestamp': created, 'updated_at': created,
+                    # mostly active chats, so the chat burst workload gets bot replies
+                    'status': rng.choices([0, 1, 2], weights=[1, 6, 3])[0],
+                    'expert_score': rng.choice([0.0, 0.0, 3.0, 4.0, 5.0]),
+                    'parent_score': rng.choice([0.0, 0.0, 4.0, 5.0]),
+                })
+        db.session.execute(insert(Chat), chat_rows)
+        chats = db.session.query(Chat.id, Chat.parent_id, Chat.expert_id, Chat.created_at, Chat.status) \
+            .order_by(Chat.id).all()
+
+        message_rows = []
+        last_timestamps = {}
+        for i in range(messages):
+            chat = chats[rng.randrange(len(chats))]
+            sender_type = ['parent', 'bot', 'expert'][i % 3] if rng.random() < 0.9 else 'bot'
+            timestamp = chat.created_at + timedelta(seconds=rng.uniform(0, (now - chat.created_at).total_seconds()))
+            last_timestamps[chat.id] = max(timestamp, last_timestamps.get(chat.id, timestamp))
+            message_rows.append({
+                'chat_id': chat.id,
+                'sender_type': sender_type,
+                'sender_id': chat.parent_id if sender_type == 'parent' else chat.expert_id,
+                'content': rng.choice(PHRASES).format(rng.choice(TOPICS)),
+                'timestamp': timestamp,
+                'machine_score': 10.0 if sender_type != 'bot' else round(rng.uniform(0.3, 1.0), 2),
+                'expert_score': 0.0,
+                'expert_feedback': '',
+                'expert_revision': '',
+            })
+        for chunk in _rows_in_chunks(message_rows):
+            db.session.execute(insert(Message), chunk)
+        db.session.execute(update(Chat), [
+            {'id': chat_id, 'last_message_timestamp': timestamp} for chat_id, timestamp in last_timestamps.items()
+        ])
+
+        for i in range(logic_keys):
+            logic_key = LogicKey(key=f'{TOPICS[i % len(TOPICS)]}-{i}')
+            db.session.add(logic_key)
+            db.session.flush()
+            db.session.execute(insert(Logic), [{
+                'emotional': rng.choice(['焦虑', '愤怒', '无助']), 'focus': rng.choice(TOPICS),
+                'logic': rng.choice(PHRASES).format(rng.choice(TOPICS)), 'logic_key_id': logic_key.id,
+            } for _ in range(4)])
+        db.session.commit()
+
+    return {
+        'parent_ids': parent_ids,
+        'expert_ids': expert_ids,
+        'active_chats': [(chat.id, chat.parent_id) for chat in chats if chat.status != 0],
+        'topics': TOPICS,
+    }
@@ -0,0 +1,40 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep
+
+
+class SmsGateway:
+    """Local stand-in for the SMS gateway: accepts every send after `latency` seconds."""
+
+    def __init__(self, latency=0.3, host='127.0.0.1', port=0):
+        self.latency = latency
+        self.received = 0
+        self._lock = threading.Lock()
+        gateway = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                sleep(gateway.latency)
+                json.loads(body or b'{}')
+                with gateway._lock:
+                    gateway.received += 1
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(b'{"code": 0}')
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.url = f'http://{host}:{self._server.server_address[1]}/scheduler/check/v1'
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name='sms-gateway', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
@@ -0,0 +1,105 @@
+import io
+import sys
+import wave
+import types
+import hashlib
+import itertools
+import threading
+from time import sleep
+
+# seconds each stand-in takes; set by benchmarks.run before parent_app is imported
+LATENCY = {
+    'agent': 2.0,
+    'accumulation': 0.5,
+    'summary': 1.0,
+    'tts': 0.8,
+    'asr': 0.3,
+}
+# share of bot replies scored below LOW_MACHINE_SCORE, which suspends the chat
+LOW_SCORE_RATE = 0.0
+
+SAMPLE_RATE = 16000
+_user_ids = itertools.count(1)
+_user_ids_lock = threading.Lock()
+
+
+def _digest(*parts):
+    return hashlib.sha256('\x00'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def education_agent(content, parent_id, chat_id):
+    sleep(LATENCY['agent'])
+    digest = _digest(content, parent_id, chat_id)
+    score = 0.3 if int(digest[:8], 16) / 0xffffffff < LOW_SCORE_RATE else 0.9
+    return f'关于“{content[-20:]}”，建议先倾听孩子的想法。\n\n可以和孩子一起制定计划（{digest[:6]}）。<score>{score}'
+
+
+def knowledge_accumulation(chat_id):
+    sleep(LATENCY['accumulation'])
+
+
+def summarize_once_person_prompt(parent_id, chat_id):
+    sleep(LATENCY['summary'])
+
+
+def summarize_overall_personality(parent_id):
+    sleep(LATENCY['summary'])
+
+
+def generate_user_id():
+    with _user_ids_lock:
+        return f'user{next(_user_ids):06d}'
+
+
+def wav_bytes(seconds, frequency=440):
+    # a deterministic square wave, good enough for ffmpeg and the decoders
+    period = max(SAMPLE_RATE // frequency, 2)
+    frame = (b'\xff\x3f' * (period // 2) + b'\x01\xc0' * (period - period // 2))
+    samples = frame * (int(SAMPLE_RATE * seconds) // period + 1)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(samples[:int(SAMPLE_RATE * seconds) * 2])
+    return buffer.getvalue()
+
+
+class TextToSpeech:
+    def __init__(self, text):
+        self.text = text
+        self.token = None
+
+    def get_token(self):
+        self.token = 'benchmark-token'
+        return self.token
+
+    def save_audio(self, path):
+        sleep(LATENCY['tts'])
+        with open(path, 'wb') as audio_file:
+            audio_file.write(wav_bytes(min(0.1 * len(self.text or ''), 10)))
+
+
+def wenet_voice_to_text(path):
+    sleep(LATENCY['asr'])
+    with open(path, 'rb') as wav_file:
+        return f'识别结果{_digest(wav_file.read())[:6]}'
+
+
+def install():
+    """Register the stand-ins under the module names parent_app imports."""
+    modules = {
+        'agent': {'education_agent': education_agent},
+        'accumulation': {'knowledge_accumulation': knowledge_accumulation},
+        'parent_profile': {
+            'summarize_once_person_prompt': summarize_once_person_prompt,
+            'summarize_overall_personality': summarize_overall_personality,
+        },
+        'random_username': {'generate_user_id': generate_user_id},
+        'text_to_voice': {'TextToSpeech': TextToSpeech},
+        'voice_to_text': {'wenet_voice_to_text': wenet_voice_to_text},
+    }
+    for name, attributes in modules.items():
+        module = types.ModuleType(name)
+        module.__dict__.update(attributes)
+        sys.modules[name] = module
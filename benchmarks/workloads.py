@@ -0,0 +1,147 @@
+import math
+import threading
+from collections import defaultdict
+from time import monotonic, perf_counter, sleep
+
+import requests
+
+from benchmarks.stubs import wav_bytes
+
+
+class Recorder:
+    """Latency samples and error counts per endpoint, shared by the workload threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, endpoint, seconds, ok=True):
+        with self._lock:
+            self.samples[endpoint].append(seconds)
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def error(self, endpoint):
+        with self._lock:
+            self.errors[endpoint] += 1
+
+    def request(self, session, endpoint, method, url, **kwargs):
+        # times the full response, including streamed bodies
+        started = perf_counter()
+        try:
+            response = session.request(method, url, timeout=60, **kwargs)
+            response.content
+        except requests.RequestException:
+            self.record(endpoint, perf_counter() - started, ok=False)
+            return None
+        self.record(endpoint, perf_counter() - started, ok=response.status_code < 400 or response.status_code == 304)
+        return response
+
+
+def percentile(values, p):
+    # nearest-rank percentile of an already sorted list
+    if not values:
+        return None
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+def chat_burst(base_url, data, recorder, deadline, worker, workers, reply_timeout=60):
+    """Parents send three quick messages, then poll until the bot reply shows up."""
+    session = requests.Session()
+    chats = data['active_chats'][worker::workers]
+    i = 0
+    while chats and monotonic() < deadline:
+        chat_id, parent_id = chats[i % len(chats)]
+        i += 1
+        latest = recorder.request(session, 'get_chat_messages', 'GET',
+                                  f'{base_url}/chats/{chat_id}/get_messages', params={'limit': 1})
+        if latest is None or latest.status_code != 200:
+            continue
+        last_id = latest.json()['last_id'] or 0
+        for n in range(3):
+            recorder.request(session, 'create_message', 'POST', f'{base_url}/create_message', json={
+                'chat_id': chat_id, 'sender_type': 'parent', 'sender_id': parent_id,
+                'content': f'孩子最近{data["topics"][(i + n) % len(data["topics"])]}的问题怎么办（{worker}-{i}-{n}）',
+            })
+            sleep(0.1)
+        started = perf_counter()
+        while perf_counter() - started < reply_timeout:
+            poll = recorder.request(session, 'get_chat_messages', 'GET',
+                                    f'{base_url}/chats/{chat_id}/get_messages', params={'since_id': last_id})
+            if poll is not None and poll.status_code == 200 and \
+                    any(message['sender_type'] == 'bot' for message in poll.json()['messages']):
+                recorder.record('reply_e2e', perf_counter() - started)
+                break
+            sleep(0.2)
+        else:
+            recorder.error('reply_e2e')
+
+
+def expert_polling(base_url, data, recorder, deadline, worker, workers, interval=0.5):
+    """An expert's frontend polling its chat list, dashboard, search and the logic library."""
+    session = requests.Session()
+    expert_id = data['expert_ids'][worker % len(data['expert_ids'])]
+    etags = {}
+    i = 0
+    while monotonic() < deadline:
+        for endpoint, url, params in [
+            ('get_expert_chats', f'{base_url}/experts/{expert_id}/get_chats', {'include': 'summary'}),
+            ('get_all_logics', f'{base_url}/logics/get_all', None),
+        ]:
+            headers = {'If-None-Match': etags[endpoint]} if endpoint in etags else {}
+            response = recorder.request(session, endpoint, 'GET', url, params=params, headers=headers)
+            if response is not None and response.headers.get('ETag'):
+                etags[endpoint] = response.headers['ETag']
+        recorder.request(session, 'get_expert_dashboard', 'GET', f'{base_url}/experts/{expert_id}/dashboard')
+        recorder.request(session, 'search_messages', 'GET', f'{base_url}/messages/search', params={
+            'q': data['topics'][i % len(data['topics'])], 'expert_id': expert_id, 'limit': 20,
+        })
+        i += 1
+        sleep(interval)
+
+
+def voice_roundtrip(base_url, data, recorder, deadline, worker, workers):
+    """Speech in, a reply read back out: ASR upload followed by a fresh synthesis."""
+    session = requests.Session()
+    i = 0
+    while monotonic() < deadline:
+        audio = wav_bytes(2.0, frequency=200 + (worker * 97 + i) % 800)
+        response = recorder.request(session, 'convert_audio_to_text', 'POST', f'{base_url}/convert_audio_to_text',
+                                    files={'audio': ('speech.wav', audio, 'audio/wav')})
+        text = response.json().get('text', '') if response is not None and response.status_code == 200 else ''
+        recorder.request(session, 'convert_text_to_audio', 'POST', f'{base_url}/convert_text_to_audio',
+                         json={'text': f'{text}，这是第{worker}-{i}条回复。'})
+        i += 1
+
+
+def sms_verification(base_url, data, recorder, deadline, worker, workers):
+    """Verification code requests for distinct phones, sent through the local gateway stub."""
+    session = requests.Session()
+    i = 0
+    while monotonic() < deadline:
+        recorder.request(session, 'send_verification_code', 'POST', f'{base_url}/send_verification_code',
+                         json={'phone': f'137{worker:02d}{i:06d}'})
+        i += 1
+        sleep(0.05)
+
+
+WORKLOADS = {
+    'burst': chat_burst,
+    'polling': expert_polling,
+    'voice': voice_roundtrip,
+    'sms': sms_verification,
+}
+
+
+def run_workload(workload, base_url, data, concurrency, duration):
+    recorder = Recorder()
+    deadline = monotonic() + duration
+    threads = [threading.Thread(target=workload, args=(base_url, data, recorder, deadline, worker, concurrency),
+                                name=f'bench-{workload.__name__}-{worker}', daemon=True)
+               for worker in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder
@@ -0,0 +1,127 @@
+import threading
+from datetime import datetime
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+SEPARATOR = '\n\n\n'
+
+
+class MemoryCoordinationStore:
+    """Pending parent messages per chat, for a single worker process.
+
+    Each chat's buffer carries a generation: the id of the last message appended
+    to it. A reply generated from a snapshot is only current if complete() finds
+    the same generation; message ids are never reused, so a buffer that was
+    completed and started again cannot be mistaken for the old one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buffers = {}  # chat_id -> (generation, content)
+
+    def append(self, chat_id, generation, content):
+        with self._lock:
+            current = self._buffers.get(chat_id)
+            self._buffers[chat_id] = (generation, content if current is None else current[1] + SEPARATOR + content)
+            return self._buffers[chat_id]
+
+    def seed(self, chat_id, generation, content):
+        # keeps an existing buffer, otherwise starts one, e.g. from a reply job after a restart
+        with self._lock:
+            return self._buffers.setdefault(chat_id, (generation, content))
+
+    def snapshot(self, chat_id):
+        with self._lock:
+            return self._buffers.get(chat_id)
+
+    def complete(self, chat_id, generation):
+        # clears the buffer only if nothing was appended since the snapshot with this generation
+        with self._lock:
+            current = self._buffers.get(chat_id)
+            if current is None or current[0] != generation:
+                return False
+            del self._buffers[chat_id]
+            return True
+
+    def discard(self, chat_id):
+        with self._lock:
+            self._buffers.pop(chat_id, None)
+
+    def size(self):
+        with self._lock:
+            return len(self._buffers)
+
+
+class DatabaseCoordinationStore:
+    """The same buffers kept in `table`, shared by every worker process and host.
+
+    `table` needs chat_id (primary key), generation, content and updated_at
+    columns. Each call is its own short transaction on `engine`, so the buffer is
+    visible to other processes as soon as it returns; the row lock taken by the
+    UPDATE or DELETE makes append and complete atomic against each other.
+    """
+
+    def __init__(self, engine, table):
+        self.engine = engine
+        self.table = table
+
+    def _read(self, connection, chat_id):
+        table = self.table
+        row = connection.execute(
+            select(table.c.generation, table.c.content).where(table.c.chat_id == chat_id)
+        ).first()
+        return None if row is None else (row.generation, row.content)
+
+    def _append(self, chat_id, generation, content):
+        table = self.table
+        with self.engine.begin() as connection:
+            updated = connection.execute(update(table).where(table.c.chat_id == chat_id).values(
+                generation=generation,
+                content=table.c.content + SEPARATOR + content,
+                updated_at=datetime.utcnow(),
+            )).rowcount
+            if not updated:
+                connection.execute(insert(table).values(
+                    chat_id=chat_id, generation=generation, content=content, updated_at=datetime.utcnow(),
+                ))
+            return self._read(connection, chat_id)
+
+    def append(self, chat_id, generation, content):
+        try:
+            return self._append(chat_id, generation, content)
+        except IntegrityError:
+            # another process inserted the buffer between our UPDATE and INSERT, so the UPDATE finds it now
+            return self._append(chat_id, generation, content)
+
+    def seed(self, chat_id, generation, content):
+        try:
+            with self.engine.begin() as connection:
+                current = self._read(connection, chat_id)
+                if current is not None:
+                    return current
+                connection.execute(insert(self.table).values(
+                    chat_id=chat_id, generation=generation, content=content, updated_at=datetime.utcnow(),
+                ))
+                return (generation, content)
+        except IntegrityError:
+            return self.snapshot(chat_id)
+
+    def snapshot(self, chat_id):
+        with self.engine.connect() as connection:
+            return self._read(connection, chat_id)
+
+    def complete(self, chat_id, generation):
+        table = self.table
+        with self.engine.begin() as connection:
+            return connection.execute(delete(table).where(
+                table.c.chat_id == chat_id, table.c.generation == generation
+            )).rowcount == 1
+
+    def discard(self, chat_id):
+        with self.engine.begin() as connection:
+            connection.execute(delete(self.table).where(self.table.c.chat_id == chat_id))
+
+    def size(self):
+        with self.engine.connect() as connection:
+            return connection.execute(select(func.count()).select_from(self.table)).scalar()
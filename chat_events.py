@@ -0,0 +1,79 @@
+import json
+import queue
+import threading
+
+_CLOSED = (None, None, None)
+
+
+class ChatEventBroker:
+    """In-process fan-out of chat events to Server-Sent Events subscribers.
+
+    Subscribers that fall too far behind are dropped; the client reconnects with
+    Last-Event-ID and the endpoint replays the missed messages from the database,
+    which also covers events published by another worker process.
+    """
+
+    def __init__(self, max_queue_size=100):
+        self.max_queue_size = max_queue_size
+        self._lock = threading.Lock()
+        self._subscribers = {}  # chat_id -> set of queues
+
+    def subscribe(self, chat_id):
+        subscriber = queue.Queue(maxsize=self.max_queue_size)
+        with self._lock:
+            self._subscribers.setdefault(chat_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, chat_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(chat_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[chat_id]
+
+    def publish(self, chat_id, event, data, event_id=None):
+        with self._lock:
+            subscribers = list(self._subscribers.get(chat_id, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait((event, data, event_id))
+            except queue.Full:
+                self.unsubscribe(chat_id, subscriber)
+                with subscriber.mutex:
+                    subscriber.queue.clear()
+                subscriber.put_nowait(_CLOSED)
+
+
+def format_sse(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append('data: ' + json.dumps(data, ensure_ascii=False))
+    return '\n'.join(lines) + '\n\n'
+
+
+def stream_events(broker, chat_id, subscriber, backlog=(), heartbeat=15):
+    """Yield SSE frames: the replayed backlog first, then live events until the client goes away."""
+    try:
+        last_id = None
+        for event, data, event_id in backlog:
+            last_id = event_id
+            yield format_sse(event, data, event_id)
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                event, data, event_id = subscriber.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ': keep-alive\n\n'
+                continue
+            if event is None:
+                # dropped for being too slow; the client reconnects and replays what it missed
+                return
+            if event_id is not None and last_id is not None and event_id <= last_id:
+                continue
+            yield format_sse(event, data, event_id)
+    finally:
+        broker.unsubscribe(chat_id, subscriber)
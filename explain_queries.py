@@ -0,0 +1,78 @@
+"""Print the query plan of each hot endpoint query.
+
+Run against the configured database after `flask db upgrade`:
+
+    python explain_queries.py [chat_id] [parent_id] [expert_id]
+
+On MySQL this runs EXPLAIN and prints the chosen key per query, on SQLite
+it runs EXPLAIN QUERY PLAN. Queries that fall back to a full table scan are
+flagged so a missing index shows up before it hurts production.
+"""
+import sys
+from datetime import datetime
+
+from sqlalchemy import func
+
+from parent_app import app, db, Chat, Message, LogicKey, Verification, LOW_MACHINE_SCORE, message_text_filter
+
+
+def hot_queries(chat_id, parent_id, expert_id):
+    yield 'get_messages (page)', Message.query.filter_by(chat_id=chat_id) \
+        .order_by(Message.timestamp.desc(), Message.id.desc()).limit(51)
+    yield 'get_messages (since_id)', Message.query.filter_by(chat_id=chat_id) \
+        .filter(Message.timestamp > datetime.utcnow()).order_by(Message.timestamp.asc(), Message.id.asc()).limit(51)
+    yield 'get_parent_chats', Chat.query.filter_by(parent_id=parent_id)
+    yield 'get_expert_chats', Chat.query.filter_by(expert_id=expert_id)
+    yield 'get_chats_between_expert_and_parent', Chat.query.filter_by(expert_id=expert_id, parent_id=parent_id)
+    yield 'chat messages (batched)', Message.query.filter(Message.chat_id.in_([chat_id, chat_id + 1])) \
+        .order_by(Message.timestamp.asc(), Message.id.asc())
+    yield 'placeholder messages', Message.query.filter_by(chat_id=chat_id, sender_type='system')
+    yield 'expert dashboard (by status)', Chat.query.with_entities(Chat.status, func.count(Chat.id)) \
+        .filter_by(expert_id=expert_id).group_by(Chat.status)
+    yield 'expert dashboard (alerts)', Message.query.with_entities(Message.chat_id, func.count(Message.id)) \
+        .join(Chat, Chat.id == Message.chat_id).filter(Chat.expert_id == expert_id, Message.sender_type == 'bot',
+                                                       Message.machine_score < LOW_MACHINE_SCORE).group_by(Message.chat_id)
+    yield 'message search', Message.query.join(Chat, Chat.id == Message.chat_id) \
+        .filter(message_text_filter('学习困难'), Chat.expert_id == expert_id).order_by(Message.id.desc()).limit(51)
+    yield 'logic key lookup', LogicKey.query.filter_by(key='key')
+    yield 'verification lookup', Verification.query.filter_by(phone='13800000000', code='0000')
+
+
+def explain(query):
+    connection = db.session.connection()
+    dialect = connection.dialect
+    compiled = query.statement.compile(dialect=dialect, compile_kwargs={'render_postcompile': True})
+    if dialect.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+    prefix = 'EXPLAIN QUERY PLAN ' if dialect.name == 'sqlite' else 'EXPLAIN '
+    result = connection.exec_driver_sql(prefix + str(compiled), params)
+    return list(result.keys()), [tuple(row) for row in result]
+
+
+def is_full_scan(dialect_name, columns, rows):
+    if dialect_name == 'sqlite':
+        # an FTS5 "SCAN ... VIRTUAL TABLE INDEX" is a lookup in the full-text index, not a table scan
+        return any(str(row[-1]).startswith('SCAN') and 'USING' not in str(row[-1])
+                   and 'VIRTUAL TABLE INDEX' not in str(row[-1]) for row in rows)
+    type_index = columns.index('type')
+    return any(row[type_index] == 'ALL' for row in rows)
+
+
+def main():
+    args = [int(arg) for arg in sys.argv[1:4]]
+    chat_id, parent_id, expert_id = args + [1] * (3 - len(args))
+    with app.app_context():
+        dialect_name = db.session.connection().dialect.name
+        for name, query in hot_queries(chat_id, parent_id, expert_id):
+            columns, rows = explain(query)
+            marker = 'FULL SCAN' if is_full_scan(dialect_name, columns, rows) else 'ok'
+            print(f'== {name} [{marker}]')
+            print('   ' + ' | '.join(columns))
+            for row in rows:
+                print('   ' + ' | '.join(str(value) for value in row))
+
+
+if __name__ == '__main__':
+    main()
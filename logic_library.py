@@ -0,0 +1,72 @@
+import json
+import hashlib
+import threading
+from time import monotonic
+
+
+class LogicLibrary:
+    """In-process copy of the serialized logic tree.
+
+    `loader()` returns the tree as a list of logic keys, each with its logics, and
+    `fingerprint()` returns a cheap value that changes whenever the tables do. The
+    tree is rebuilt only after invalidate() (add_logic in this process) or when the
+    fingerprint, checked at most every `check_interval` seconds, shows that another
+    process has written. The agent reads the same copy, so prompt assembly does
+    not hit the database either.
+    """
+
+    def __init__(self, loader=None, fingerprint=None, check_interval=30.0):
+        self.loader = loader
+        self.fingerprint = fingerprint
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._version = 0
+        self._built = None  # (version, fingerprint, checked_at, logic_keys, by_key, body, etag)
+
+    def configure(self, loader, fingerprint=None, check_interval=None):
+        with self._lock:
+            self.loader = loader
+            self.fingerprint = fingerprint
+            if check_interval is not None:
+                self.check_interval = check_interval
+            self._version += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+
+    def _current(self):
+        with self._lock:
+            built = self._built
+            version = self._version
+            if built is not None and built[0] == version:
+                if self.fingerprint is None or monotonic() - built[2] < self.check_interval:
+                    return built
+                fingerprint = self.fingerprint()
+                if fingerprint == built[1]:
+                    self._built = built = (version, fingerprint, monotonic()) + built[3:]
+                    return built
+            else:
+                fingerprint = self.fingerprint() if self.fingerprint else None
+            logic_keys = self.loader()
+            body = json.dumps({'success': True, 'logic_keys': logic_keys})
+            etag = hashlib.sha1(body.encode('utf-8')).hexdigest()
+            by_key = {logic_key['key']: logic_key['logics'] for logic_key in logic_keys}
+            self._built = built = (version, fingerprint, monotonic(), logic_keys, by_key, body, etag)
+            return built
+
+    def get(self):
+        """The logic keys as served by /logics/get_all; treat the result as read-only."""
+        return self._current()[3]
+
+    def logics_for(self, key):
+        return self._current()[4].get(key, [])
+
+    def response_body(self):
+        """(JSON body, ETag) for /logics/get_all."""
+        built = self._current()
+        return built[5], built[6]
+
+
+# shared by parent_app, which configures the loader, and the agent
+library = LogicLibrary()
@@ -0,0 +1,65 @@
+"""message full-text index
+
+Revision ID: 0009_message_fulltext
+Revises: 0008_chat_versions
+Create Date: 2026-10-18 16:31:02.417586
+
+MySQL gets a FULLTEXT index with the ngram parser (Chinese has no word
+boundaries), which InnoDB keeps up to date on every write. SQLite, the local
+stand-in, gets an external-content FTS5 table with the trigram tokenizer, kept in
+sync by triggers on message.
+
+Note that a later batch_alter_table on message recreates the table on SQLite and
+drops the triggers; such a migration has to recreate them.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_message_fulltext'
+down_revision = '0008_chat_versions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'mysql':
+        op.execute('ALTER TABLE message ADD FULLTEXT INDEX ft_message_content (content, expert_revision) WITH PARSER ngram')
+    elif dialect == 'sqlite':
+        op.execute("CREATE VIRTUAL TABLE message_fts USING fts5("
+                   "content, expert_revision, content='message', content_rowid='id', tokenize='trigram')")
+        op.execute("""
+            CREATE TRIGGER message_fts_ai AFTER INSERT ON message BEGIN
+                INSERT INTO message_fts(rowid, content, expert_revision)
+                VALUES (new.id, new.content, new.expert_revision);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER message_fts_ad AFTER DELETE ON message BEGIN
+                INSERT INTO message_fts(message_fts, rowid, content, expert_revision)
+                VALUES ('delete', old.id, old.content, old.expert_revision);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER message_fts_au AFTER UPDATE OF content, expert_revision ON message BEGIN
+                INSERT INTO message_fts(message_fts, rowid, content, expert_revision)
+                VALUES ('delete', old.id, old.content, old.expert_revision);
+                INSERT INTO message_fts(rowid, content, expert_revision)
+                VALUES (new.id, new.content, new.expert_revision);
+            END
+        """)
+        op.execute("INSERT INTO message_fts(message_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'mysql':
+        op.execute('ALTER TABLE message DROP INDEX ft_message_content')
+    elif dialect == 'sqlite':
+        op.execute('DROP TRIGGER IF EXISTS message_fts_au')
+        op.execute('DROP TRIGGER IF EXISTS message_fts_ad')
+        op.execute('DROP TRIGGER IF EXISTS message_fts_ai')
+        op.execute('DROP TABLE IF EXISTS message_fts')
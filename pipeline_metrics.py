@@ -0,0 +1,61 @@
+from functools import wraps
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# PrometheusMetrics(app) only times the routes; the expensive stages run in background
+# threads and ASR worker processes, so they are measured here and exported on /metrics too.
+
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+stage_seconds = Histogram(
+    'pipeline_stage_seconds',
+    'Latency of one pipeline stage: education_agent, summarize_once_person_prompt, '
+    'summarize_overall_personality, knowledge_accumulation, save_audio, tts, transcode, wenet',
+    ['stage'],
+    buckets=STAGE_BUCKETS,
+)
+reply_generations_in_flight = Gauge(
+    'reply_generations_in_flight',
+    'education_agent calls currently running, including ones whose result will be dropped'
+)
+ongoing_chats_size = Gauge(
+    'ongoing_chats_size',
+    'Chats with buffered parent messages waiting for a bot reply'
+)
+reply_generations_preempted = Counter(
+    'reply_generations_preempted_total',
+    'Reply generations abandoned because a newer parent message arrived'
+)
+chat_suspensions = Counter(
+    'chat_suspensions_total',
+    'Chats suspended because a bot reply scored below LOW_MACHINE_SCORE'
+)
+timeouts = Counter(
+    'pipeline_timeouts_total',
+    'Speech synthesis and recognition requests that timed out',
+    ['component']
+)
+for component in ('asr', 'tts'):
+    # export the zero series before the first timeout
+    timeouts.labels(component)
+asr_queue_wait_seconds = Histogram(
+    'asr_queue_wait_seconds',
+    'Time utterances wait for an ASR worker'
+)
+asr_batch_size = Histogram(
+    'asr_batch_size',
+    'Utterances sent to an ASR worker together',
+    buckets=(1, 2, 4, 8, 16, 32)
+)
+
+
+def timed(stage, fn, in_progress=None):
+    """Wrap fn so every call is observed in stage_seconds, and optionally tracked by a gauge."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        with stage_seconds.labels(stage).time():
+            if in_progress is None:
+                return fn(*args, **kwargs)
+            with in_progress.track_inprogress():
+                return fn(*args, **kwargs)
+    return wrapper
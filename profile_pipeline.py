@@ -0,0 +1,53 @@
+import heapq
+import logging
+import threading
+from time import monotonic
+
+logger = logging.getLogger('family_education')
+
+
+class CoalescingRunner:
+    """Runs handler(key, items) on one background thread, at most once per `interval` per key.
+
+    Triggers for a key that is already scheduled only add their item to the next run,
+    so a burst of replies for the same parent turns into a single summarization pass.
+    The single thread keeps profiling from competing with the reply workers.
+    """
+
+    def __init__(self, handler, interval=120.0, name='profile-updater'):
+        self.handler = handler
+        self.interval = interval
+        self.name = name
+        self._cond = threading.Condition()
+        self._pending = {}  # key -> set of items for the next run
+        self._due = []  # heap of (due, key)
+        self._last_run = {}
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def trigger(self, key, item=None):
+        with self._cond:
+            items = self._pending.get(key)
+            if items is None:
+                items = self._pending[key] = set()
+                due = max(monotonic(), self._last_run.get(key, float('-inf')) + self.interval)
+                heapq.heappush(self._due, (due, key))
+                self._cond.notify()
+            if item is not None:
+                items.add(item)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._due or self._due[0][0] > monotonic():
+                    self._cond.wait(self._due[0][0] - monotonic() if self._due else None)
+                _, key = heapq.heappop(self._due)
+                items = self._pending.pop(key)
+                self._last_run[key] = monotonic()
+            try:
+                self.handler(key, items)
+            except Exception:
+                logger.exception(f'{self.name} failed for {key}')
@@ -0,0 +1,103 @@
+import logging
+import threading
+import contextvars
+from time import perf_counter
+
+from flask import request
+from prometheus_client import Histogram
+from sqlalchemy import event
+
+logger = logging.getLogger('family_education')
+
+db_queries_per_request = Histogram(
+    'db_queries_per_request',
+    'SQL statements executed while handling one request',
+    ['endpoint'],
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+)
+db_seconds_per_request = Histogram(
+    'db_seconds_per_request',
+    'Time spent in SQL statements while handling one request',
+    ['endpoint'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+
+_current = contextvars.ContextVar('query_stats', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryStats:
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.count = 0
+        self.seconds = 0.0
+
+
+def parameter_shape(parameters, executemany):
+    # the shape of the bound parameters, never their values
+    # insertmanyvalues batches report executemany with a single flat row
+    if executemany and isinstance(parameters, (list, tuple)) and parameters \
+            and isinstance(parameters[0], (dict, list, tuple)):
+        return f'{len(parameters)} x {parameter_shape(parameters[0], False)}'
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(sorted(str(key) for key in parameters)) + '}'
+    if isinstance(parameters, (list, tuple)):
+        return f'{len(parameters)} positional'
+    return type(parameters).__name__
+
+
+class QueryAccounting:
+    """Counts SQL statements and their time per request from engine events.
+
+    Every request is observed in the per-endpoint histograms. In debug mode the
+    totals are also sent back as X-DB-Query-Count / X-DB-Time-ms. Statements slower
+    than `slow_query_ms` are logged with their parameter shape and the route (or
+    background thread) that ran them. With a `budget`, a request that runs more
+    statements raises QueryBudgetExceeded; this strict mode is meant for tests.
+    """
+
+    def __init__(self, app, engine, slow_query_ms=200, budget=None):
+        self.app = app
+        self.slow_query_ms = slow_query_ms
+        self.budget = budget
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.teardown_request(self._teardown_request)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = perf_counter() - conn.info['query_start'].pop()
+        stats = _current.get()
+        if stats is not None:
+            stats.count += 1
+            stats.seconds += elapsed
+        if elapsed * 1000 >= self.slow_query_ms:
+            origin = stats.endpoint if stats is not None else f'thread {threading.current_thread().name}'
+            logger.warning(f'Slow query ({elapsed * 1000:.1f} ms) from {origin}, '
+                           f'parameters {parameter_shape(parameters, executemany)}: {" ".join(statement.split())[:2000]}')
+
+    def _start_request(self):
+        _current.set(QueryStats(request.endpoint or 'unknown'))
+
+    def _finish_request(self, response):
+        stats = _current.get()
+        if stats is None:
+            return response
+        db_queries_per_request.labels(stats.endpoint).observe(stats.count)
+        db_seconds_per_request.labels(stats.endpoint).observe(stats.seconds)
+        if self.app.debug:
+            response.headers['X-DB-Query-Count'] = str(stats.count)
+            response.headers['X-DB-Time-ms'] = f'{stats.seconds * 1000:.1f}'
+        if self.budget is not None and stats.count > self.budget:
+            raise QueryBudgetExceeded(f'{stats.endpoint} ran {stats.count} SQL statements, budget is {self.budget}')
+        return response
+
+    def _teardown_request(self, exc):
+        _current.set(None)
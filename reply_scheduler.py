@@ -0,0 +1,148 @@
+import logging
+import threading
+from collections import deque
+from time import monotonic
+
+logger = logging.getLogger('family_education')
+
+
+class GenerationCancelled(Exception):
+    pass
+
+
+class GenerationToken:
+    """Marks one reply generation for a chat; cancelled when a newer parent message arrives."""
+
+    def __init__(self):
+        self._cancelled = False
+        self._wakeup = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    def cancel(self):
+        self._cancelled = True
+        self._wakeup.set()
+
+    def run(self, executor, fn, *args):
+        # returns fn's result, or raises GenerationCancelled as soon as the token is cancelled;
+        # a call that already started keeps running on the executor but its result is dropped
+        future = executor.submit(fn, *args)
+        future.add_done_callback(lambda _: self._wakeup.set())
+        self._wakeup.wait()
+        if self._cancelled:
+            future.cancel()
+            raise GenerationCancelled()
+        return future.result()
+
+
+class _ReplyJob:
+    def __init__(self, chat_id, parent_id, message_id, now, debounce):
+        self.chat_id = chat_id
+        self.parent_id = parent_id
+        self.message_id = message_id
+        self.first_seen = now
+        self.due = now + debounce
+        self.ready = False
+
+
+class ReplyScheduler:
+    """Runs reply generation on a fixed pool of worker threads.
+
+    Messages for a chat that arrive within `debounce` seconds of each other are
+    merged into one job (never delayed more than `max_wait` after the first one),
+    due jobs are handed out round-robin across parents, and `can_accept` lets
+    callers turn away new chats once `max_pending` jobs are queued.
+    """
+
+    def __init__(self, handler, workers=4, debounce=1.5, max_wait=6.0, max_pending=200):
+        self.handler = handler
+        self.workers = workers
+        self.debounce = debounce
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+        self._cond = threading.Condition()
+        self._jobs = {}  # chat_id -> job waiting for its debounce window or a worker
+        self._ready = {}  # parent_id -> deque of due chat ids
+        self._rotation = deque()  # parents with due jobs, in round-robin order
+        self._threads = []
+        self._stopping = False
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'reply-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def shutdown(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._jobs)
+
+    def can_accept(self, chat_id):
+        # a chat that already has a queued job is merged into it and never rejected
+        with self._cond:
+            return chat_id in self._jobs or len(self._jobs) < self.max_pending
+
+    def submit(self, chat_id, parent_id, message_id, delay=None):
+        # delay overrides the debounce window, e.g. for retries and recovered jobs
+        now = monotonic()
+        with self._cond:
+            job = self._jobs.get(chat_id)
+            if job is None:
+                self._jobs[chat_id] = _ReplyJob(chat_id, parent_id, message_id, now,
+                                                self.debounce if delay is None else max(delay, 0))
+            else:
+                job.message_id = message_id
+                if not job.ready and delay is None:
+                    job.due = min(now + self.debounce, job.first_seen + self.max_wait)
+            self._cond.notify()
+
+    def _promote_due_jobs(self, now):
+        next_due = None
+        for job in self._jobs.values():
+            if job.ready:
+                continue
+            if job.due <= now:
+                job.ready = True
+                if job.parent_id not in self._ready:
+                    self._ready[job.parent_id] = deque()
+                    self._rotation.append(job.parent_id)
+                self._ready[job.parent_id].append(job.chat_id)
+            elif next_due is None or job.due < next_due:
+                next_due = job.due
+        return next_due
+
+    def _take(self):
+        parent_id = self._rotation.popleft()
+        chat_ids = self._ready[parent_id]
+        job = self._jobs.pop(chat_ids.popleft())
+        if chat_ids:
+            self._rotation.append(parent_id)
+        else:
+            del self._ready[parent_id]
+        return job
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopping:
+                        return
+                    now = monotonic()
+                    next_due = self._promote_due_jobs(now)
+                    if self._rotation:
+                        job = self._take()
+                        break
+                    self._cond.wait(None if next_due is None else next_due - now)
+            try:
+                self.handler(job.chat_id, job.message_id)
+            except Exception:
+                logger.exception(f'Reply generation failed for chat {job.chat_id}')
@@ -0,0 +1,132 @@
+import json
+import queue
+import logging
+import threading
+from time import monotonic, sleep
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger('family_education')
+
+
+class TokenBucket:
+    """Per-key token buckets: `burst` sends at once, refilled at one token per `interval` seconds."""
+
+    def __init__(self, burst=1, interval=60.0, max_keys=100000):
+        self.burst = burst
+        self.interval = interval
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = {}  # key -> (tokens, updated)
+
+    def _tokens(self, key, now):
+        # called with the lock held
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - updated) / self.interval)
+
+    def peek(self, key):
+        """Like take() without spending the token."""
+        with self._lock:
+            tokens = self._tokens(key, monotonic())
+        return 0 if tokens >= 1 else (1 - tokens) * self.interval
+
+    def refund(self, key):
+        """Give back a token spent on a request that was turned away for another reason."""
+        now = monotonic()
+        with self._lock:
+            self._buckets[key] = (min(self.burst, self._tokens(key, now) + 1), now)
+
+    def take(self, key):
+        """Spend a token for key; returns 0 on success, otherwise the seconds until one is available."""
+        now = monotonic()
+        with self._lock:
+            tokens = self._tokens(key, now)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return (1 - tokens) * self.interval
+            self._buckets[key] = (tokens - 1, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+            return 0
+
+    def _prune(self, now):
+        # a bucket that has refilled completely is the same as no bucket
+        for key, (tokens, updated) in list(self._buckets.items()):
+            if tokens + (now - updated) / self.interval >= self.burst:
+                del self._buckets[key]
+
+
+class SmsSender:
+    """Sends verification codes to the SMS gateway from background threads.
+
+    Requests share one pooled session with connect/read timeouts, and failures are
+    retried with exponential backoff. The code is already stored when send() is
+    called, so the HTTP request never holds up the caller.
+    """
+
+    def __init__(self, url, sign_id, template_id, message_type=2308, workers=2, timeout=(3.05, 10),
+                 retries=3, backoff=1.0, max_queue=1000):
+        self.url = url
+        self.sign_id = sign_id
+        self.template_id = template_id
+        self.message_type = message_type
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=workers))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=workers))
+        self.session.headers['Content-Type'] = 'application/json'
+        self._queue = queue.Queue(maxsize=max_queue)
+        for i in range(workers):
+            threading.Thread(target=self._run, name=f'sms-sender-{i}', daemon=True).start()
+
+    def send(self, phone, code):
+        """Queue a verification code; returns False if the outbox is full."""
+        try:
+            self._queue.put_nowait((phone, code))
+            return True
+        except queue.Full:
+            return False
+
+    def pending_count(self):
+        return self._queue.qsize()
+
+    def _payload(self, phone, code):
+        return {
+            'text': {
+                'phones': [phone],
+                'sign_id': self.sign_id,
+                'template_id': self.template_id,
+                'para': [code]
+            },
+            'type': self.message_type
+        }
+
+    def _deliver(self, phone, code):
+        data = json.dumps(self._payload(phone, code))
+        for attempt in range(1, self.retries + 1):
+            try:
+                response = self.session.post(self.url, data=data, timeout=self.timeout)
+                if response.status_code == 200:
+                    return True
+                # client errors will not get better on retry
+                if 400 <= response.status_code < 500:
+                    logger.error(f'SMS gateway rejected code for {phone}: {response.status_code} {response.text[:200]}')
+                    return False
+                logger.warning(f'SMS gateway returned {response.status_code} for {phone} (attempt {attempt})')
+            except requests.RequestException as e:
+                logger.warning(f'SMS gateway request failed for {phone} (attempt {attempt}): {str(e)}')
+            if attempt < self.retries:
+                sleep(self.backoff * 2 ** (attempt - 1))
+        logger.error(f'Giving up sending verification code to {phone} after {self.retries} attempts')
+        return False
+
+    def _run(self):
+        while True:
+            phone, code = self._queue.get()
+            try:
+                self._deliver(phone, code)
+            except Exception:
+                logger.exception(f'Sending verification code to {phone} failed')
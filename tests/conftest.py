@@ -0,0 +1,73 @@
+import os
+import sys
+import itertools
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_ids = itertools.count(1)
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """parent_app booted on a migrated SQLite file, with the benchmark stand-ins for external services."""
+    from benchmarks import run
+    workdir = str(tmp_path_factory.mktemp('parent_app'))
+    # the recovery sweeper must not pick up the jobs the tests drive by hand
+    os.environ['REPLY_JOB_LEASE_SECONDS'] = '3600'
+    args = run.parse_args(['--agent-latency', '0', '--summary-latency', '0', '--accumulation-latency', '0',
+                           '--tts-latency', '0', '--asr-latency', '0'])
+    return run.boot(args, workdir, 'http://127.0.0.1:9/unused')
+
+
+@pytest.fixture
+def submitted(app_module, monkeypatch):
+    """Reply jobs handed to the scheduler, recorded instead of run so each test drives them itself."""
+    calls = []
+    monkeypatch.setattr(app_module.reply_scheduler, 'submit',
+                        lambda chat_id, parent_id, message_id, delay=None: calls.append((chat_id, message_id)))
+    return calls
+
+
+@pytest.fixture(params=['memory', 'database'])
+def coordination(request, app_module, monkeypatch):
+    """Runs each test against both CHAT_COORDINATION_BACKEND stores."""
+    from chat_coordination import MemoryCoordinationStore, DatabaseCoordinationStore
+    if request.param == 'memory':
+        store = MemoryCoordinationStore()
+    else:
+        with app_module.app.app_context():
+            store = DatabaseCoordinationStore(app_module.db.engine, app_module.ChatBuffer.__table__)
+    monkeypatch.setattr(app_module, 'chat_coordination', store)
+    return store
+
+
+@pytest.fixture
+def chat(app_module):
+    """A fresh active chat; returns (chat_id, parent_id)."""
+    m = app_module
+    n = next(_ids)
+    with m.app.app_context():
+        parent = m.Parent(username=f'parent{n}', phone=f'138{n:08d}', password_hash='x')
+        expert = m.Expert(username=f'expert{n}', phone=f'139{n:08d}', password_hash='x')
+        m.db.session.add_all([parent, expert])
+        m.db.session.flush()
+        new_chat = m.Chat(parent_id=parent.id, expert_id=expert.id, status=1)
+        m.db.session.add(new_chat)
+        m.db.session.commit()
+        return new_chat.id, parent.id
+
+
+@pytest.fixture
+def agent(app_module, monkeypatch):
+    """Replaces the education agent with one that answers in a single paragraph and records what it was asked."""
+    prompts = []
+
+    def education_agent(content, parent_id, chat_id):
+        prompts.append(content)
+        return f'reply to {len(prompts)}<score>0.9'
+
+    monkeypatch.setattr(app_module, 'education_agent', education_agent)
+    return prompts
@@ -0,0 +1,89 @@
+import multiprocessing
+
+import pytest
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, Text, create_engine
+
+from chat_coordination import SEPARATOR, DatabaseCoordinationStore, MemoryCoordinationStore
+
+metadata = MetaData()
+chat_buffer = Table(
+    'chat_buffer', metadata,
+    Column('chat_id', Integer, primary_key=True, autoincrement=False),
+    Column('generation', Integer, nullable=False),
+    Column('content', Text, nullable=False),
+    Column('updated_at', DateTime, nullable=False),
+)
+
+
+def database_store(path):
+    engine = create_engine(f'sqlite:///{path}', connect_args={'timeout': 30})
+    metadata.create_all(engine)
+    return DatabaseCoordinationStore(engine, chat_buffer)
+
+
+@pytest.fixture(params=['memory', 'database'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryCoordinationStore()
+    return database_store(tmp_path / 'coordination.db')
+
+
+def test_append_merges_and_moves_the_generation(store):
+    assert store.append(1, 10, 'a') == (10, 'a')
+    assert store.append(1, 11, 'b') == (11, 'a' + SEPARATOR + 'b')
+    assert store.append(2, 12, 'c') == (12, 'c')
+    assert store.snapshot(1) == (11, 'a' + SEPARATOR + 'b')
+    assert store.size() == 2
+
+
+def test_complete_only_clears_the_generation_it_saw(store):
+    store.append(1, 10, 'a')
+    generation, _ = store.snapshot(1)
+    store.append(1, 11, 'b')
+    assert store.complete(1, generation) is False
+    assert store.snapshot(1) == (11, 'a' + SEPARATOR + 'b')
+    assert store.complete(1, 11) is True
+    assert store.snapshot(1) is None
+    assert store.complete(1, 11) is False
+
+
+def test_buffer_started_again_is_not_the_completed_one(store):
+    store.append(1, 10, 'a')
+    assert store.complete(1, 10)
+    store.append(1, 12, 'b')
+    assert store.complete(1, 10) is False
+    assert store.snapshot(1) == (12, 'b')
+
+
+def test_seed_keeps_an_existing_buffer(store):
+    assert store.seed(1, 10, 'from job') == (10, 'from job')
+    assert store.seed(1, 9, 'older job') == (10, 'from job')
+    store.append(1, 11, 'b')
+    assert store.seed(1, 10, 'from job') == (11, 'from job' + SEPARATOR + 'b')
+
+
+def test_discard(store):
+    store.append(1, 10, 'a')
+    store.discard(1)
+    store.discard(1)
+    assert store.snapshot(1) is None
+    assert store.size() == 0
+
+
+def _append_messages(path, worker, count):
+    store = database_store(path)
+    for n in range(count):
+        store.append(1, worker * 1000 + n, f'{worker}-{n}')
+
+
+def test_appends_from_several_processes_are_all_kept(tmp_path):
+    path = tmp_path / 'coordination.db'
+    database_store(path)
+    workers = [multiprocessing.Process(target=_append_messages, args=(path, worker, 20)) for worker in range(1, 5)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+    _, content = database_store(path).snapshot(1)
+    assert sorted(content.split(SEPARATOR)) == sorted(f'{worker}-{n}' for worker in range(1, 5) for n in range(20))
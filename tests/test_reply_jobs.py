@@ -0,0 +1,286 @@
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+
+def post_message(app_module, chat_id, parent_id, content):
+    response = app_module.app.test_client().post('/create_message', json={
+        'chat_id': chat_id, 'sender_type': 'parent', 'sender_id': parent_id, 'content': content,
+    })
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['message_id']
+
+
+def reply_job(app_module, chat_id):
+    with app_module.app.app_context():
+        job = app_module.ReplyJob.query.filter_by(chat_id=chat_id).first()
+        return None if job is None else {column: getattr(job, column) for column in
+                                         ('message_id', 'content', 'status', 'attempts', 'locked_by')}
+
+
+def bot_replies(app_module, chat_id):
+    with app_module.app.app_context():
+        return app_module.Message.query.filter_by(chat_id=chat_id, sender_type='bot').count()
+
+
+def placeholder_id(app_module, chat_id):
+    with app_module.app.app_context():
+        return app_module.db.session.get(app_module.Chat, chat_id).placeholder_message_id
+
+
+def add_parent_message(app_module, chat_id, parent_id, content):
+    # a message committed by another process whose reply job has not landed yet
+    with app_module.app.app_context():
+        message = app_module.Message(chat_id=chat_id, sender_type='parent', sender_id=parent_id,
+                                     content=content, machine_score=10.0)
+        app_module.db.session.add(message)
+        app_module.db.session.commit()
+        return message.id
+
+
+def test_enqueue_only_moves_forward(app_module, chat):
+    chat_id, parent_id = chat
+    m = app_module
+    with m.app.app_context():
+        m.enqueue_reply_job(chat_id, parent_id, 5, 'newer')
+        m.db.session.commit()
+        m.enqueue_reply_job(chat_id, parent_id, 3, 'older')
+        m.db.session.commit()
+    assert reply_job(m, chat_id)['message_id'] == 5
+    assert reply_job(m, chat_id)['content'] == 'newer'
+
+    with m.app.app_context():
+        m.ReplyJob.query.filter_by(chat_id=chat_id).delete()
+        m.db.session.commit()
+        # the reply worker deleted the row; the next message starts a new job instead of failing
+        m.enqueue_reply_job(chat_id, parent_id, 7, 'again')
+        m.db.session.commit()
+    assert reply_job(m, chat_id)['message_id'] == 7
+
+
+def test_enqueue_rearms_a_running_job(app_module, chat):
+    chat_id, parent_id = chat
+    m = app_module
+    with m.app.app_context():
+        m.enqueue_reply_job(chat_id, parent_id, 5, 'first')
+        m.db.session.commit()
+        assert m.claim_reply_job(chat_id, 5) is not None
+        m.enqueue_reply_job(chat_id, parent_id, 6, 'first\n\n\nsecond')
+        m.db.session.commit()
+    job = reply_job(m, chat_id)
+    assert (job['message_id'], job['status'], job['attempts'], job['locked_by']) == (6, 'pending', 0, None)
+
+
+def test_claim_is_exclusive_until_the_lease_expires(app_module, chat):
+    chat_id, parent_id = chat
+    m = app_module
+    with m.app.app_context():
+        m.enqueue_reply_job(chat_id, parent_id, 5, 'content')
+        m.db.session.commit()
+        assert m.claim_reply_job(chat_id, 4) is None
+        assert m.claim_reply_job(chat_id, 5) is not None
+        assert m.claim_reply_job(chat_id, 5) is None
+        m.ReplyJob.query.filter_by(chat_id=chat_id).update(
+            {'lease_expires_at': datetime.utcnow() - timedelta(seconds=1)})
+        m.db.session.commit()
+        assert m.claim_reply_job(chat_id, 5).attempts == 2
+
+
+def test_create_message_retries_a_lost_enqueue_race(app_module, chat, coordination, submitted, agent, monkeypatch):
+    chat_id, parent_id = chat
+    m = app_module
+    enqueue = m.enqueue_reply_job
+    failures = []
+
+    def racing_enqueue(*args):
+        if not failures:
+            failures.append(args)
+            raise IntegrityError('INSERT INTO reply_job', {}, Exception('UNIQUE constraint failed: reply_job.chat_id'))
+        enqueue(*args)
+
+    monkeypatch.setattr(m, 'enqueue_reply_job', racing_enqueue)
+    message_id = post_message(m, chat_id, parent_id, 'hello')
+    assert failures
+    assert reply_job(m, chat_id)['message_id'] == message_id
+    assert placeholder_id(m, chat_id) is not None
+    assert submitted == [(chat_id, message_id)]
+
+
+def test_create_message_reports_an_enqueue_that_keeps_failing(app_module, chat, coordination, submitted, agent,
+                                                              monkeypatch):
+    chat_id, parent_id = chat
+    m = app_module
+
+    def failing_enqueue(*args):
+        raise IntegrityError('INSERT INTO reply_job', {}, Exception('UNIQUE constraint failed: reply_job.chat_id'))
+
+    monkeypatch.setattr(m, 'enqueue_reply_job', failing_enqueue)
+    response = m.app.test_client().post('/create_message', json={
+        'chat_id': chat_id, 'sender_type': 'parent', 'sender_id': parent_id, 'content': 'hello',
+    })
+    assert response.status_code == 503
+    assert submitted == []
+    assert placeholder_id(m, chat_id) is None
+
+
+def test_reply_answers_the_job_and_clears_the_placeholder(app_module, chat, coordination, submitted, agent):
+    chat_id, parent_id = chat
+    m = app_module
+    message_id = post_message(m, chat_id, parent_id, 'hello')
+    m.run_reply_job(chat_id, message_id)
+    assert bot_replies(m, chat_id) == 1
+    assert reply_job(m, chat_id) is None
+    assert placeholder_id(m, chat_id) is None
+    assert coordination.snapshot(chat_id) is None
+
+
+def test_buffer_moved_on_without_a_job_hands_the_job_over(app_module, chat, coordination, submitted, agent):
+    chat_id, parent_id = chat
+    m = app_module
+    first_id = post_message(m, chat_id, parent_id, 'first')
+    second_id = add_parent_message(m, chat_id, parent_id, 'second')
+    coordination.append(chat_id, second_id, 'second')
+
+    m.run_reply_job(chat_id, first_id)
+    job = reply_job(m, chat_id)
+    assert (job['message_id'], job['status'], job['locked_by']) == (second_id, 'pending', None)
+    assert job['content'] == 'first\n\n\nsecond'
+    assert submitted[-1] == (chat_id, second_id)
+    assert bot_replies(m, chat_id) == 0
+
+    m.run_reply_job(chat_id, second_id)
+    assert agent == ['first\n\n\nsecond']
+    assert bot_replies(m, chat_id) == 1
+    assert reply_job(m, chat_id) is None
+    assert placeholder_id(m, chat_id) is None
+
+
+def test_message_after_the_claim_leaves_the_job_to_its_enqueue(app_module, chat, coordination, submitted, agent):
+    chat_id, parent_id = chat
+    m = app_module
+    first_id = post_message(m, chat_id, parent_id, 'first')
+    with m.app.app_context():
+        assert m.claim_reply_job(chat_id, first_id) is not None
+    second_id = post_message(m, chat_id, parent_id, 'second')
+
+    assert m.generate_expert_reply(chat_id, first_id) is False
+    job = reply_job(m, chat_id)
+    assert (job['message_id'], job['status']) == (second_id, 'pending')
+    assert submitted == [(chat_id, first_id), (chat_id, second_id)]
+
+    m.run_reply_job(chat_id, first_id)  # a stale submit finds nothing to claim
+    m.run_reply_job(chat_id, second_id)
+    assert agent == ['first\n\n\nsecond']
+    assert bot_replies(m, chat_id) == 1
+    assert reply_job(m, chat_id) is None
+
+
+def test_message_during_generation_is_answered_once(app_module, chat, coordination, submitted, agent, monkeypatch):
+    chat_id, parent_id = chat
+    m = app_module
+    first_id = post_message(m, chat_id, parent_id, 'first')
+    answer = m.education_agent
+    later = []
+    interrupted = threading.Event()
+
+    def interrupted_agent(content, sender_id, agent_chat_id):
+        if not later:
+            # cancels this generation, which returns while the request below is still finishing
+            later.append(post_message(m, chat_id, parent_id, 'second'))
+            interrupted.set()
+        return answer(content, sender_id, agent_chat_id)
+
+    monkeypatch.setattr(m, 'education_agent', interrupted_agent)
+    m.run_reply_job(chat_id, first_id)
+    assert interrupted.wait(5)
+    assert bot_replies(m, chat_id) == 0
+    assert reply_job(m, chat_id)['message_id'] == later[0]
+    assert chat_id not in m.ongoing_generations
+
+    m.run_reply_job(chat_id, later[0])
+    assert agent == ['first', 'first\n\n\nsecond']
+    assert bot_replies(m, chat_id) == 1
+    assert reply_job(m, chat_id) is None
+    assert placeholder_id(m, chat_id) is None
+
+
+def test_append_from_another_process_during_generation_hands_the_job_over(app_module, chat, coordination,
+                                                                          submitted, monkeypatch):
+    chat_id, parent_id = chat
+    m = app_module
+    first_id = post_message(m, chat_id, parent_id, 'first')
+    second_id = add_parent_message(m, chat_id, parent_id, 'second')
+    answer = m.education_agent
+
+    def agent_racing_another_process(content, sender_id, agent_chat_id):
+        # the other process cannot cancel this token, it only moves the generation
+        coordination.append(chat_id, second_id, 'second')
+        return answer(content, sender_id, agent_chat_id)
+
+    monkeypatch.setattr(m, 'education_agent', agent_racing_another_process)
+    m.run_reply_job(chat_id, first_id)
+    job = reply_job(m, chat_id)
+    assert (job['message_id'], job['status'], job['locked_by']) == (second_id, 'pending', None)
+    assert submitted[-1] == (chat_id, second_id)
+    assert bot_replies(m, chat_id) == 0
+
+
+def test_job_without_pending_messages_is_retired(app_module, chat, coordination, submitted, agent):
+    chat_id, parent_id = chat
+    m = app_module
+    message_id = post_message(m, chat_id, parent_id, 'hello')
+    with m.app.app_context():
+        assert m.claim_reply_job(chat_id, message_id) is not None
+    coordination.discard(chat_id)
+
+    assert m.generate_expert_reply(chat_id, message_id) is False
+    assert reply_job(m, chat_id) is None
+    assert placeholder_id(m, chat_id) is None
+
+
+def test_job_for_a_deleted_message_is_retired(app_module, chat, coordination, submitted, agent):
+    chat_id, parent_id = chat
+    m = app_module
+    message_id = add_parent_message(m, chat_id, parent_id, 'hello')
+    with m.app.app_context():
+        m.enqueue_reply_job(chat_id, parent_id, message_id, 'hello')
+        m.Message.query.filter_by(id=message_id).delete()
+        m.db.session.commit()
+
+    m.run_reply_job(chat_id, message_id)
+    assert reply_job(m, chat_id) is None
+    assert coordination.snapshot(chat_id) is None
+
+
+def test_agent_failure_goes_back_to_pending(app_module, chat, coordination, submitted, agent, monkeypatch):
+    chat_id, parent_id = chat
+    m = app_module
+    message_id = post_message(m, chat_id, parent_id, 'hello')
+
+    def failing_agent(content, sender_id, agent_chat_id):
+        raise RuntimeError('model unavailable')
+
+    monkeypatch.setattr(m, 'education_agent', failing_agent)
+    m.run_reply_job(chat_id, message_id)
+    job = reply_job(m, chat_id)
+    assert (job['message_id'], job['status'], job['attempts'], job['locked_by']) == (message_id, 'pending', 1, None)
+    assert chat_id not in m.ongoing_generations
+    assert submitted[-1] == (chat_id, message_id)
+    assert placeholder_id(m, chat_id) is not None
+
+
+def test_agent_failure_gives_up_after_max_attempts(app_module, chat, coordination, submitted, agent, monkeypatch):
+    chat_id, parent_id = chat
+    m = app_module
+    message_id = post_message(m, chat_id, parent_id, 'hello')
+
+    def failing_agent(content, sender_id, agent_chat_id):
+        raise RuntimeError('model unavailable')
+
+    monkeypatch.setattr(m, 'education_agent', failing_agent)
+    monkeypatch.setitem(m.app.config, 'REPLY_JOB_MAX_ATTEMPTS', 1)
+    m.run_reply_job(chat_id, message_id)
+    assert reply_job(m, chat_id)['status'] == 'failed'
+    assert placeholder_id(m, chat_id) is None
+    assert coordination.snapshot(chat_id) is None
@@ -0,0 +1,106 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic, sleep
+
+import pytest
+
+from reply_scheduler import GenerationCancelled, GenerationToken, ReplyScheduler
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, chat_id, message_id):
+        self.calls.append((chat_id, message_id, monotonic()))
+
+    def wait(self, count, timeout=5):
+        deadline = monotonic() + timeout
+        while len(self.calls) < count and monotonic() < deadline:
+            sleep(0.01)
+        return self.calls
+
+
+@pytest.fixture
+def scheduler():
+    schedulers = []
+
+    def create(handler, **kwargs):
+        schedulers.append(ReplyScheduler(handler, **kwargs))
+        return schedulers[-1]
+
+    yield create
+    for scheduler in schedulers:
+        scheduler.shutdown()
+
+
+def test_messages_within_the_debounce_window_are_merged(scheduler):
+    handler = Recorder()
+    replies = scheduler(handler, workers=1, debounce=0.2, max_wait=5)
+    replies.start()
+    for message_id in (1, 2, 3):
+        replies.submit(7, 70, message_id)
+        sleep(0.05)
+    calls = handler.wait(1)
+    sleep(0.3)
+    assert [(chat_id, message_id) for chat_id, message_id, _ in calls] == [(7, 3)]
+
+
+def test_debounce_is_capped_by_max_wait(scheduler):
+    handler = Recorder()
+    replies = scheduler(handler, workers=1, debounce=0.2, max_wait=0.4)
+    replies.start()
+    started = monotonic()
+    message_id = 0
+    while not handler.calls and monotonic() - started < 2:
+        message_id += 1
+        replies.submit(7, 70, message_id)
+        sleep(0.05)
+    assert handler.calls
+    assert handler.calls[0][2] - started < 0.6
+
+
+def test_delay_overrides_the_debounce(scheduler):
+    handler = Recorder()
+    replies = scheduler(handler, workers=1, debounce=5, max_wait=10)
+    replies.start()
+    replies.submit(7, 70, 1, delay=0)
+    assert handler.wait(1, timeout=1)
+
+
+def test_can_accept_stops_new_chats_at_max_pending(scheduler):
+    replies = scheduler(Recorder(), workers=1, debounce=5, max_pending=2)
+    replies.submit(1, 10, 1)
+    replies.submit(2, 20, 2)
+    assert replies.pending_count() == 2
+    assert replies.can_accept(1)
+    assert not replies.can_accept(3)
+
+
+def test_due_jobs_are_handed_out_round_robin_across_parents(scheduler):
+    handler = Recorder()
+    replies = scheduler(handler, workers=1, debounce=0, max_wait=0)
+    # parent 10 has three chats waiting, parent 20 one; parent 20 must not wait behind all of them
+    for chat_id, parent_id in ((1, 10), (2, 10), (3, 10), (4, 20)):
+        replies.submit(chat_id, parent_id, chat_id, delay=0)
+    replies.start()
+    calls = handler.wait(4)
+    assert [chat_id for chat_id, _, _ in calls] == [1, 4, 2, 3]
+
+
+def test_cancelled_token_stops_waiting_for_the_generation():
+    token = GenerationToken()
+    release = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        threading.Timer(0.05, token.cancel).start()
+        with pytest.raises(GenerationCancelled):
+            token.run(executor, release.wait, 5)
+        assert token.cancelled
+        release.set()
+
+
+def test_token_returns_the_generation_result():
+    token = GenerationToken()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert token.run(executor, lambda a, b: a + b, 1, 2) == 3
+    assert not token.cancelled
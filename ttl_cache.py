@@ -0,0 +1,34 @@
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+
+class TtlCache:
+    """Small thread-safe cache whose entries are recomputed `ttl` seconds after they were built.
+
+    Concurrent misses for the same key may each compute the value; the last one wins.
+    """
+
+    def __init__(self, ttl=10.0, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value), oldest first
+
+    def get_or_compute(self, key, compute):
+        now = monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+        value = compute()
+        with self._lock:
+            self._entries[key] = (monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,355 @@
+import os
+import json
+import uuid
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep, time
+
+from pipeline_metrics import stage_seconds, timeouts
+
+logger = logging.getLogger('family_education')
+
+
+def wav_complete(path, size):
+    # a wav whose RIFF header already announces its final length is complete once the file reaches it;
+    # writers that patch the header on close only match after closing
+    with open(path, 'rb') as audio_file:
+        header = audio_file.read(8)
+    return len(header) == 8 and header[:4] == b'RIFF' and int.from_bytes(header[4:], 'little') + 8 == size
+
+
+class AudioCache:
+    """Content-addressed wav files in `directory`.
+
+    Entries expire `ttl` seconds after they were written and the least recently
+    used ones are evicted once the directory grows past `max_bytes`.
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024, ttl=7 * 24 * 3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (size, created), least recently used first
+        self._total_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.endswith('.wav'):
+                continue
+            if '.tmp.' in name:
+                # left behind by an interrupted synthesis
+                os.remove(path)
+                continue
+            stat = os.stat(path)
+            files.append((stat.st_atime, name[:-len('.wav')], stat.st_size, stat.st_mtime))
+        for _, key, size, created in sorted(files):
+            self._entries[key] = (size, created)
+            self._total_bytes += size
+
+    @staticmethod
+    def key(text, voice=None):
+        payload = json.dumps([text, voice or {}], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.wav')
+
+    def temp_path(self, key):
+        return os.path.join(self.directory, f'{key}.{uuid.uuid4().hex}.tmp.wav')
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time() - entry[1] > self.ttl or not os.path.exists(self.path(key)):
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return self.path(key)
+
+    def put(self, key, temp_path):
+        os.replace(temp_path, self.path(key))
+        size = os.path.getsize(self.path(key))
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries[key][0]
+            self._entries[key] = (size, time())
+            self._entries.move_to_end(key)
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                self._remove(next(iter(self._entries)))
+        return self.path(key)
+
+    def _remove(self, key):
+        size, _ = self._entries.pop(key)
+        self._total_bytes -= size
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+class TokenCache:
+    """Keeps the TTS auth token until it expires instead of fetching one per request.
+
+    The token is read from and written back to `attribute` on the TextToSpeech
+    instance; if get_token() does not set it, every request fetches its own.
+    """
+
+    def __init__(self, ttl=24 * 3600, attribute='token'):
+        self.ttl = ttl
+        self.attribute = attribute
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires_at = 0
+
+    def apply(self, tts):
+        with self._lock:
+            if self._token is not None and time() < self._expires_at:
+                setattr(tts, self.attribute, self._token)
+                return
+            tts.get_token()
+            token = getattr(tts, self.attribute, None)
+            if token:
+                self._token = token
+                self._expires_at = time() + self.ttl
+
+    def invalidate(self):
+        with self._lock:
+            self._token = None
+
+
+class SynthesisJob:
+    """Completion-aware handle for one synthesis.
+
+    Readers block on a condition variable that the watcher signals whenever the
+    temp file grows and once it has been moved into the cache.
+    """
+
+    def __init__(self, key, temp_path=None, path=None):
+        self.key = key
+        self.temp_path = temp_path
+        self.path = path
+        self.error = None
+        self.size = os.path.getsize(path) if path else 0
+        self.started_at = time()
+        self.save_returned = False
+        self.stable_since = None
+        self._cond = threading.Condition()
+        self._callbacks = []
+
+    @property
+    def done(self):
+        return self.path is not None or self.error is not None
+
+    def _notify(self, size=None, path=None, error=None):
+        with self._cond:
+            if size is not None:
+                self.size = size
+            if path is not None:
+                self.path = path
+            if error is not None:
+                self.error = error
+            callbacks = self._callbacks if self.done else []
+            if self.done:
+                self._callbacks = []
+            self._cond.notify_all()
+        for callback in callbacks:
+            callback(self)
+
+    def add_done_callback(self, callback):
+        with self._cond:
+            if not self.done:
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def wait(self, timeout=None):
+        with self._cond:
+            self._cond.wait_for(lambda: self.done, timeout)
+        if self.error is not None:
+            raise self.error
+        if self.path is None:
+            raise TimeoutError('Timeout waiting for audio file to be saved')
+        return self.path
+
+    def wait_for_data(self, timeout=None):
+        # True once there is something to stream, False on timeout
+        with self._cond:
+            self._cond.wait_for(lambda: self.done or self.size > 0, timeout)
+            return self.done or self.size > 0
+
+    def iter_chunks(self, timeout, chunk_size=16 * 1024):
+        """Yield the wav bytes as they are written, until the synthesis completes."""
+        self.wait_for_data(timeout)
+        with self._cond:
+            source = self.path or self.temp_path
+        # an open handle on the temp file keeps working after it is renamed into the cache
+        try:
+            audio_file = open(source, 'rb')
+        except FileNotFoundError:
+            audio_file = open(self.wait(timeout), 'rb')
+        with audio_file:
+            sent = 0
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self.done or self.size > sent, timeout)
+                    size, done, error = self.size, self.done, self.error
+                if error is not None or (not done and size <= sent):
+                    return
+                chunk = audio_file.read(chunk_size)
+                if chunk:
+                    sent += len(chunk)
+                    yield chunk
+                elif done:
+                    return
+                else:
+                    # the watcher saw more bytes than are readable yet; wait for its next signal
+                    with self._cond:
+                        self._cond.wait(timeout)
+
+
+class TtsService:
+    """Serves synthesized audio from the cache and runs one synthesis per distinct text at a time.
+
+    save_audio runs on a small executor; a single watcher thread follows the temp
+    files, so request threads wait on a SynthesisJob instead of polling the disk.
+    A file is moved into the cache once save_audio has returned and either its
+    wav header says it is complete or its size has not changed for `settle_time`
+    seconds, which covers writers that keep appending after save_audio returns.
+    """
+
+    def __init__(self, tts_class, cache, token_cache, voice=None, timeout=20, workers=4,
+                 speculative_workers=2, max_speculative=32, watch_interval=0.05, settle_time=2.0):
+        self.tts_class = tts_class
+        self.cache = cache
+        self.token_cache = token_cache
+        self.voice = voice or {}
+        self.timeout = timeout
+        self.watch_interval = watch_interval
+        self.settle_time = settle_time
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tts')
+        # speculative work has its own small pool so it never queues ahead of a listener
+        self._speculative_executor = ThreadPoolExecutor(max_workers=speculative_workers, thread_name_prefix='tts-speculative')
+        self.max_speculative = max_speculative
+        self._speculative_pending = 0
+        self._lock = threading.Lock()
+        self._inflight = {}  # cache key -> SynthesisJob
+        self._watcher = threading.Thread(target=self._watch, name='tts-watcher', daemon=True)
+        self._watcher.start()
+
+    def submit(self, text):
+        key = self.cache.key(text, self.voice)
+        path = self.cache.get(key)
+        if path:
+            return SynthesisJob(key, path=path)
+        with self._lock:
+            job = self._inflight.get(key)
+            if job is None:
+                job = self._inflight[key] = SynthesisJob(key, temp_path=self.cache.temp_path(key))
+                self._executor.submit(self._save, job, text)
+        return job
+
+    def presynthesize(self, text):
+        """Warm the cache for text nobody has asked to hear yet; returns False when skipped."""
+        key = self.cache.key(text, self.voice)
+        if self.cache.get(key):
+            return True
+        with self._lock:
+            if key in self._inflight:
+                return True
+            if self._speculative_pending >= self.max_speculative:
+                return False
+            self._speculative_pending += 1
+            job = self._inflight[key] = SynthesisJob(key, temp_path=self.cache.temp_path(key))
+            self._speculative_executor.submit(self._save, job, text)
+        job.add_done_callback(self._speculative_done)
+        return True
+
+    def _speculative_done(self, job):
+        with self._lock:
+            self._speculative_pending -= 1
+
+    def synthesize(self, text):
+        return self.submit(text).wait(self.timeout)
+
+    def _save(self, job, text):
+        if job.done:
+            # timed out while still queued on the executor; nobody is waiting for this file any more
+            return
+        try:
+            tts = self.tts_class(text)
+            self.token_cache.apply(tts)
+            with stage_seconds.labels('save_audio').time():
+                tts.save_audio(job.temp_path)
+            job.save_returned = True
+        except Exception as e:
+            logger.exception('Speech synthesis failed')
+            self._finish(job, error=e)
+        if job.done and job.path is None:
+            # the job failed or timed out while save_audio was still writing
+            self._remove_temp(job)
+
+    @staticmethod
+    def _remove_temp(job):
+        try:
+            os.remove(job.temp_path)
+        except FileNotFoundError:
+            pass
+
+    def _finish(self, job, path=None, error=None):
+        with self._lock:
+            self._inflight.pop(job.key, None)
+        if path is not None:
+            # save_audio may return before the file is complete, so this is the full synthesis time
+            stage_seconds.labels('tts').observe(time() - job.started_at)
+        else:
+            # untracked temp files would sit outside max_bytes until the next restart
+            self._remove_temp(job)
+        job._notify(path=path, error=error)
+
+    def _watch(self):
+        while True:
+            sleep(self.watch_interval)
+            with self._lock:
+                jobs = list(self._inflight.values())
+            now = time()
+            for job in jobs:
+                if job.done:
+                    continue
+                try:
+                    self._check(job, now)
+                except Exception as e:
+                    # one broken job must not stop the watcher that every other request waits on
+                    logger.exception(f'Watching synthesis {job.key} failed')
+                    self._finish(job, error=e)
+
+    def _check(self, job, now):
+        try:
+            size = os.path.getsize(job.temp_path)
+        except FileNotFoundError:
+            size = None
+        if size is not None and job.stable_since is None:
+            # an async writer may create the file empty and fill it later
+            job.stable_since = now
+        if size is not None and size != job.size:
+            job.stable_since = now
+            job._notify(size=size)
+        elif size and job.save_returned and (wav_complete(job.temp_path, size) or
+                                             now - job.stable_since >= self.settle_time):
+            try:
+                self._finish(job, path=self.cache.put(job.key, job.temp_path))
+            except OSError as e:
+                self._finish(job, error=e)
+        elif now - job.started_at > self.timeout:
+            timeouts.labels('tts').inc()
+            self._finish(job, error=TimeoutError('Timeout waiting for audio file to be saved'))